@@ -5,29 +5,237 @@ Analyzes the contents of checkpoint files to understand size differences.
 """
 
 import torch
+import _compat_pickle
+import collections
+import contextlib
+import copyreg
+import heapq
+import io
+import json
+import math
 import os
+import pickle
+import reprlib
 import sys
+import threading
+import warnings
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def format_size(size_bytes):
-    """Convert bytes to human readable format"""
-    if size_bytes == 0:
-        return "0B"
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
-    return f"{size_bytes:.2f}{size_names[i]}"
+from checkpoint_utils import format_size
+
+# bump whenever the cached summary layout changes, so stale sidecar files are ignored
+_CACHE_VERSION = 9
+
+# names of the common leaf types, so the walker avoids attribute lookups and callable() on them
+_TYPE_NAMES = {int: 'int', float: 'float', str: 'str', bool: 'bool', bytes: 'bytes', list: 'list', tuple: 'tuple'}
+
+# bytes per element of the common dtypes, saving a tensor.element_size() call per tensor
+_DTYPE_BYTES = {
+    torch.float64: 8,
+    torch.float32: 4,
+    torch.float16: 2,
+    torch.bfloat16: 2,
+    torch.int64: 8,
+    torch.int32: 4,
+    torch.int16: 2,
+    torch.int8: 1,
+    torch.uint8: 1,
+    torch.bool: 1,
+}
+
+# bounded reprs for previews: builtin strings/containers are cut while formatting, not
+# after; other objects still go through their own repr() and are truncated afterwards
+_PREVIEW_REPR = reprlib.Repr()
+_PREVIEW_REPR.maxstring = 100
+_PREVIEW_REPR.maxlist = 5
+_PREVIEW_REPR.maxdict = 5
+_PREVIEW_REPR.maxother = 100
+
+# top-level non-dict values (e.g. args) get the longer preview they always had
+_TOP_LEVEL_PREVIEW_REPR = reprlib.Repr()
+_TOP_LEVEL_PREVIEW_REPR.maxstring = 200
+_TOP_LEVEL_PREVIEW_REPR.maxlist = 5
+_TOP_LEVEL_PREVIEW_REPR.maxdict = 5
+_TOP_LEVEL_PREVIEW_REPR.maxother = 200
+
+class StorageStub:
+    """Stand-in for a checkpoint storage, sized from its ZIP entry without reading it"""
+    def __init__(self, key, dtype, numel, nbytes, location):
+        self.key = key
+        self.dtype = dtype
+        self.numel = numel
+        self.nbytes = nbytes
+        self.location = location
+
+class TensorStub:
+    """Stand-in for a tensor rebuilt from checkpoint metadata only"""
+    def __init__(self, storage, storage_offset, shape, stride):
+        self.storage = storage
+        self.storage_offset = storage_offset
+        self.shape = tuple(shape)
+        self.stride = tuple(stride)
+        self.dtype = storage.dtype
+
+class ObjectStub:
+    """Stand-in for an instance of a class that is never imported during analysis"""
+    def __init__(self, *args):
+        self.args = args
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            self.__dict__.update(state)
+        else:
+            self.state = state
+
+    def __repr__(self):
+        cls = type(self)
+        return f"{cls.__module__}.{cls.__name__}({_PREVIEW_REPR.repr(vars(self))})"
+
+def _rebuild_tensor_stub(storage, storage_offset, size, stride, *args):
+    return TensorStub(storage, storage_offset, size, stride)
+
+def _rebuild_parameter_stub(data, *args):
+    return data
+
+def _rebuild_from_type_stub(func, new_type, args, state):
+    return func(*args)
+
+# the only globals data.pkl may resolve to real objects; everything else becomes a stub
+_STUBS = {
+    ('torch._utils', '_rebuild_tensor_v2'): _rebuild_tensor_stub,
+    ('torch._utils', '_rebuild_parameter'): _rebuild_parameter_stub,
+    ('torch._utils', '_rebuild_parameter_with_state'): _rebuild_parameter_stub,
+    ('torch._tensor', '_rebuild_from_type_v2'): _rebuild_from_type_stub,
+    ('torch', 'Size'): tuple,
+    ('collections', 'OrderedDict'): collections.OrderedDict,
+    ('collections', 'defaultdict'): collections.defaultdict,
+    ('builtins', 'dict'): dict,
+    ('builtins', 'list'): list,
+    ('copyreg', '_reconstructor'): copyreg._reconstructor,
+    ('builtins', 'set'): set,
+    ('builtins', 'frozenset'): frozenset,
+    ('builtins', 'complex'): complex,
+    ('builtins', 'slice'): slice,
+}
+
+_STORAGE_DTYPES = {
+    'DoubleStorage': torch.float64,
+    'FloatStorage': torch.float32,
+    'HalfStorage': torch.float16,
+    'BFloat16Storage': torch.bfloat16,
+    'LongStorage': torch.int64,
+    'IntStorage': torch.int32,
+    'ShortStorage': torch.int16,
+    'CharStorage': torch.int8,
+    'ByteStorage': torch.uint8,
+    'BoolStorage': torch.bool,
+    'UntypedStorage': torch.uint8,
+}
+
+class _ZipUnpickler(pickle.Unpickler):
+    """Unpickles data.pkl, replacing every storage and tensor with a metadata stub.
+
+    find_class never imports anything: tensor rebuild functions map to stubs that only
+    record shape/dtype, storage classes map to their dtype, and unknown classes (e.g.
+    the training `args`) become ObjectStub subclasses.
+    """
+    def __init__(self, file, storage_sizes):
+        super().__init__(file)
+        self.storage_sizes = storage_sizes
+        self.storages = {}
+        self.object_stubs = {}
+
+    def find_class(self, module, name):
+        # torch pickles with protocol 2, which writes Python 2 names (e.g. __builtin__.list);
+        # the default find_class maps them back, so do the same before the table lookup
+        if (module, name) in _compat_pickle.NAME_MAPPING:
+            module, name = _compat_pickle.NAME_MAPPING[(module, name)]
+        module = _compat_pickle.IMPORT_MAPPING.get(module, module)
+        if (module, name) in _STUBS:
+            return _STUBS[(module, name)]
+        if module == 'torch':
+            if name.endswith('Storage'):
+                return self._storage_dtype(name)
+            if isinstance(getattr(torch, name, None), torch.dtype):
+                return getattr(torch, name)
+        if (module, name) not in self.object_stubs:
+            self.object_stubs[(module, name)] = type(name, (ObjectStub,), {'__module__': module})
+        return self.object_stubs[(module, name)]
+
+    @staticmethod
+    def _storage_dtype(name):
+        if name in _STORAGE_DTYPES:
+            return _STORAGE_DTYPES[name]
+        # e.g. complex or quantized storages: the legacy class knows its dtype
+        dtype = getattr(getattr(torch, name, None), 'dtype', None)
+        if not isinstance(dtype, torch.dtype):
+            raise pickle.UnpicklingError(f"unknown storage class torch.{name}")
+        return dtype
+
+    def persistent_load(self, pid):
+        typename, dtype, key, location, numel = pid
+        assert typename == 'storage', f"unexpected persistent id: {typename}"
+        if key not in self.storages:
+            self.storages[key] = StorageStub(key, dtype, numel, self.storage_sizes[key], location)
+        return self.storages[key]
+
+def load_checkpoint_zip(checkpoint_path):
+    """Read a torch ZIP checkpoint without touching tensor bytes: only the central
+    directory (for storage sizes) and data.pkl (for the object tree) are read"""
+    with zipfile.ZipFile(checkpoint_path) as zf:
+        storage_sizes = {}
+        pickle_name = None
+        for info in zf.infolist():
+            parent, _, name = info.filename.rpartition('/')
+            if parent == 'data' or parent.endswith('/data'):
+                storage_sizes[name] = info.file_size
+            elif name == 'data.pkl':
+                pickle_name = info.filename
+        if pickle_name is None:
+            raise ValueError(f"no data.pkl found in {checkpoint_path}")
+        with zf.open(pickle_name) as f:
+            return _ZipUnpickler(f, storage_sizes).load()
+
+def is_tensor(value):
+    """True for real tensors and for stubs produced by load_checkpoint_zip"""
+    return isinstance(value, TensorStub) or torch.is_tensor(value)
+
+def storage_nbytes(storage):
+    """Byte size of a StorageStub or torch storage; called once per distinct storage"""
+    if isinstance(storage, StorageStub):
+        return storage.nbytes
+    return storage.nbytes()
 
 def get_tensor_info(tensor):
     """Get detailed information about a tensor"""
-    if torch.is_tensor(tensor):
+    if isinstance(tensor, TensorStub):
+        storage = tensor.storage
+        # the tensor may be a view: size it from its own shape, not its backing storage
+        itemsize = _DTYPE_BYTES.get(tensor.dtype) or (storage.nbytes // storage.numel if storage.numel else 0)
+        return {
+            'shape': list(tensor.shape),
+            'dtype': str(tensor.dtype),
+            'size_bytes': math.prod(tensor.shape) * itemsize,
+            # every loader reports the device of a map_location='cpu' load, as the
+            # baseline did, not the device the tensor was saved from
+            'device': 'cpu',
+            'storage_key': storage.key,
+            'storage': storage
+        }
+    elif torch.is_tensor(tensor):
+        storage = tensor.untyped_storage()
+        # numel() and the dtype need no storage access, so this also holds for meta tensors
+        size_bytes = tensor.numel() * (_DTYPE_BYTES.get(tensor.dtype) or tensor.element_size())
         return {
             'shape': list(tensor.shape),
             'dtype': str(tensor.dtype),
-            'size_bytes': tensor.numel() * tensor.element_size(),
-            'device': str(tensor.device)
+            'size_bytes': size_bytes,
+            'device': 'cpu' if tensor.device.type == 'meta' else str(tensor.device),
+            # views share one storage: key it so its bytes are only counted once
+            'storage_key': storage._cdata,
+            'storage': storage
         }
     else:
         return {
@@ -35,22 +243,108 @@ def get_tensor_info(tensor):
             'size_bytes': sys.getsizeof(tensor)
         }
 
-def analyze_nested_dict(data, prefix="", max_depth=3, current_depth=0):
-    """Recursively analyze nested dictionaries"""
-    results = []
-    
-    if current_depth > max_depth:
-        return results
+@contextlib.contextmanager
+def open_for_single_read(path):
+    """Open `path` for one sequential pass, then drop its pages from the page cache.
+
+    Without this, fully loading a multi-GB checkpoint leaves it in the page cache and
+    evicts pages other processes still need. No-op advice where posix_fadvise is missing.
+    """
+    advise = hasattr(os, 'posix_fadvise')
+    with open(path, 'rb') as f:
+        if advise:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        try:
+            yield f
+        finally:
+            if advise:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+def _torch_load_weights_only_first(f, **kwargs):
+    """torch.load with weights_only=True, retried without it (and a warning) when the
+    checkpoint holds objects the restricted unpickler rejects, e.g. the training args"""
+    try:
+        return torch.load(f, weights_only=True, **kwargs)
+    except pickle.UnpicklingError as e:
+        warnings.warn(f"weights_only load failed ({e}); retrying with weights_only=False, "
+                      f"which may import and run code referenced by the checkpoint")
+        if hasattr(f, 'seek'):
+            f.seek(0)
+        return torch.load(f, weights_only=False, **kwargs)
+
+def load_checkpoint(checkpoint_path):
+    """Load a checkpoint without materializing tensor storage where torch allows it"""
+    attempts = [
+        # meta tensors keep shape/dtype but allocate no storage at all
+        dict(map_location=torch.device('meta')),
+        # torch<2.1 cannot load onto meta: memory-map so storage pages are never faulted in
+        dict(map_location='cpu', mmap=True),
+    ]
+    for kwargs in attempts:
+        try:
+            return _torch_load_weights_only_first(checkpoint_path, **kwargs)
+        except (TypeError, RuntimeError):
+            # not supported by this torch version
+            continue
+    # last resort reads every storage byte
+    with open_for_single_read(checkpoint_path) as f:
+        try:
+            return _torch_load_weights_only_first(f, map_location='cpu')
+        except TypeError:
+            # torch<1.13 has no weights_only
+            f.seek(0)
+            return torch.load(f, map_location='cpu')
+
+def value_preview(value):
+    """Short preview of a non-tensor value, computed only when it is displayed"""
+    if type(value) not in _TYPE_NAMES and callable(value):
+        return 'callable'
+    return _PREVIEW_REPR.repr(value)
+
+def analyze_nested_dict(data, prefix="", max_depth=8, seen_storages=None, seen_dicts=None):
+    """Walk nested dicts in document order, returning (tensor_items, other_items, total_size);
+    pass shared `seen_storages`/`seen_dicts` to count storages and repeated dicts once per checkpoint"""
+    if seen_storages is None:
+        seen_storages = set()
+    if seen_dicts is None:
+        seen_dicts = {}
+    tensor_items = []
+    other_items = []
+    total_size = 0
+    stack = []
+    if isinstance(data, dict) and id(data) not in seen_dicts:
+        seen_dicts[id(data)] = prefix
+        stack.append((iter(data.items()), prefix, 0))
     
-    if isinstance(data, dict):
-        for key, value in data.items():
-            full_key = f"{prefix}.{key}" if prefix else key
+    while stack:
+        items, current_prefix, depth = stack[-1]
+        
+        for key, value in items:
+            full_key = f"{current_prefix}.{key}" if current_prefix else key
             
             if isinstance(value, dict):
-                results.extend(analyze_nested_dict(value, full_key, max_depth, current_depth + 1))
-            elif torch.is_tensor(value):
+                if id(value) in seen_dicts:
+                    # already walked (and counted) under another key
+                    other_items.append({
+                        'key': full_key,
+                        'type': 'dict',
+                        'size_bytes': 0,
+                        'shared_with': seen_dicts[id(value)]
+                    })
+                elif depth < max_depth:
+                    # Anything nested deeper than max_depth is dropped from the totals and ends up
+                    # as "Unaccounted", so the default leaves ample room beyond the usual
+                    # optimizer.state.<param_id>.<exp_avg> layout
+                    seen_dicts[id(value)] = full_key
+                    stack.append((iter(value.items()), full_key, depth + 1))
+                    break  # descend now; this frame resumes after the child
+            elif is_tensor(value):
                 tensor_info = get_tensor_info(value)
-                results.append({
+                if tensor_info['storage_key'] not in seen_storages:
+                    seen_storages.add(tensor_info['storage_key'])
+                    total_size += storage_nbytes(tensor_info['storage'])
+                tensor_items.append({
                     'key': full_key,
                     'type': 'tensor',
                     'shape': tensor_info['shape'],
@@ -59,131 +353,251 @@ def analyze_nested_dict(data, prefix="", max_depth=3, current_depth=0):
                     'device': tensor_info['device']
                 })
             else:
-                results.append({
+                value_type = type(value)
+                size_bytes = sys.getsizeof(value)
+                total_size += size_bytes
+                other_items.append({
                     'key': full_key,
-                    'type': type(value).__name__,
-                    'size_bytes': sys.getsizeof(value),
-                    'value_preview': str(value)[:100] if not callable(value) else 'callable'
+                    'type': _TYPE_NAMES.get(value_type) or value_type.__name__,
+                    'size_bytes': size_bytes,
+                    'value': value
                 })
+        else:
+            # every item of this dict has been seen
+            stack.pop()
     
-    return results
+    return tensor_items, other_items, total_size
 
-def analyze_checkpoint(checkpoint_path):
-    """Analyze a single checkpoint file"""
-    print(f"\n{'='*80}")
-    print(f"ANALYZING: {checkpoint_path}")
-    print(f"{'='*80}")
+def summarize_checkpoint(checkpoint):
+    """Reduce a loaded checkpoint to the JSON-serializable summary the report is printed from"""
+    entries = []
+    seen_storages = set()
+    seen_dicts = {}
     
-    if not os.path.exists(checkpoint_path):
-        print(f"ERROR: File not found: {checkpoint_path}")
+    for key, value in checkpoint.items():
+        if isinstance(value, dict) and id(value) in seen_dicts:
+            # the same dict object as an earlier key: pickle stores it once, so it is
+            # counted there and only reported as an alias here
+            entries.append({
+                'key': key,
+                'kind': 'dict',
+                'num_items': len(value),
+                'accounted_bytes': 0,
+                'shared_with': seen_dicts[id(value)]
+            })
+        
+        elif isinstance(value, dict):
+            # Walk the nested dictionary
+            tensor_items, other_items, key_size = analyze_nested_dict(value, key, seen_storages=seen_storages, seen_dicts=seen_dicts)
+            # Keep only what the report shows: the 10 largest tensors and the first 5 other items
+            largest = heapq.nlargest(10, tensor_items, key=lambda x: x['size_bytes'])
+            entries.append({
+                'key': key,
+                'kind': 'dict',
+                'num_items': len(value),
+                'accounted_bytes': key_size,
+                'num_tensors': len(tensor_items),
+                'largest_tensors': [{k: item[k] for k in ('key', 'shape', 'dtype', 'size_bytes')} for item in largest],
+                'num_other_items': len(other_items),
+                'other_items': [{
+                    'key': item['key'],
+                    'type': item['type'],
+                    'size_bytes': item['size_bytes'],
+                    'preview': f"same object as {item['shared_with']}" if 'shared_with' in item else value_preview(item['value'])
+                } for item in other_items[:5]]
+            })
+        
+        elif is_tensor(value):
+            tensor_info = get_tensor_info(value)
+            accounted_bytes = 0
+            if tensor_info['storage_key'] not in seen_storages:
+                seen_storages.add(tensor_info['storage_key'])
+                accounted_bytes = storage_nbytes(tensor_info['storage'])
+            entries.append({
+                'key': key,
+                'kind': 'tensor',
+                'accounted_bytes': accounted_bytes,
+                'shape': tensor_info['shape'],
+                'dtype': tensor_info['dtype'],
+                'size_bytes': tensor_info['size_bytes'],
+                'device': tensor_info['device']
+            })
+        
+        else:
+            item_size = sys.getsizeof(value)
+            entries.append({
+                'key': key,
+                'kind': 'other',
+                'accounted_bytes': item_size,
+                'type': type(value).__name__,
+                'preview': _TOP_LEVEL_PREVIEW_REPR.repr(value)
+            })
+    
+    return {
+        'checkpoint_type': str(type(checkpoint)),
+        'top_level_keys': list(checkpoint.keys()),
+        'entries': entries
+    }
+
+def print_entry(entry, out):
+    """Print the report block for one top-level key of a checkpoint summary"""
+    print(f"\n{'-'*60}", file=out)
+    print(f"KEY: {entry['key']}", file=out)
+    print(f"{'-'*60}", file=out)
+    
+    if entry['kind'] == 'dict' and 'shared_with' in entry:
+        print(f"Type: dict with {entry['num_items']} items", file=out)
+        print(f"Same object as {entry['shared_with']}: contents and size are reported there", file=out)
+    
+    elif entry['kind'] == 'dict':
+        print(f"Type: dict with {entry['num_items']} items", file=out)
+        print(f"Total size: {format_size(entry['accounted_bytes'])}", file=out)
+        
+        # Show largest items of each type
+        if entry['num_tensors']:
+            print(f"\nTensors ({entry['num_tensors']} items):", file=out)
+            for i, item in enumerate(entry['largest_tensors']):
+                print(f"  {i+1:2d}. {item['key']}: {item['shape']} ({item['dtype']}) - {format_size(item['size_bytes'])}", file=out)
+            
+            if entry['num_tensors'] > 10:
+                print(f"  ... and {entry['num_tensors'] - 10} more tensors", file=out)
+        
+        if entry['num_other_items']:
+            print(f"\nOther items ({entry['num_other_items']} items):", file=out)
+            for item in entry['other_items']:
+                print(f"  - {item['key']}: {item['type']} - {format_size(item['size_bytes'])}", file=out)
+                print(f"    Preview: {item['preview']}", file=out)
+            
+            if entry['num_other_items'] > 5:
+                print(f"  ... and {entry['num_other_items'] - 5} more items", file=out)
+    
+    elif entry['kind'] == 'tensor':
+        print(f"Type: tensor", file=out)
+        print(f"Shape: {entry['shape']}", file=out)
+        print(f"Dtype: {entry['dtype']}", file=out)
+        print(f"Size: {format_size(entry['size_bytes'])}", file=out)
+        print(f"Device: {entry['device']}", file=out)
+    
+    else:
+        print(f"Type: {entry['type']}", file=out)
+        print(f"Size: {format_size(entry['accounted_bytes'])}", file=out)
+        print(f"Preview: {entry['preview']}", file=out)
+
+def _cache_path(checkpoint_path):
+    return checkpoint_path + '.analysis.json'
+
+def load_cached_summary(checkpoint_path, stat_result):
+    """Return the summary cached next to the checkpoint if it still matches its mtime and size"""
+    try:
+        with open(_cache_path(checkpoint_path)) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get('version') != _CACHE_VERSION:
         return None
+    if cached.get('mtime_size') != [stat_result.st_mtime_ns, stat_result.st_size]:
+        return None
+    return cached['summary']
+
+def save_cached_summary(checkpoint_path, stat_result, summary):
+    """Write the summary next to the checkpoint; silently skipped if the directory is read-only"""
+    cache_path = _cache_path(checkpoint_path)
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    cached = {
+        'version': _CACHE_VERSION,
+        'mtime_size': [stat_result.st_mtime_ns, stat_result.st_size],
+        'summary': summary
+    }
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(cached, f, default=str)
+        os.replace(tmp_path, cache_path)  # atomic: readers never see a partial file
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def analyze_checkpoint(checkpoint_path, out=None):
+    """Analyze a single checkpoint file, writing the report to `out` (default: stdout)"""
+    out = out or sys.stdout
+    print(f"\n{'='*80}", file=out)
+    print(f"ANALYZING: {checkpoint_path}", file=out)
+    print(f"{'='*80}", file=out)
     
-    # Get file size
-    file_size = os.path.getsize(checkpoint_path)
-    print(f"File size: {format_size(file_size)} ({file_size:,} bytes)")
+    # Get file size (a single stat call also tells us whether the file exists)
+    try:
+        stat_result = os.stat(checkpoint_path)
+    except FileNotFoundError:
+        print(f"ERROR: File not found: {checkpoint_path}", file=out)
+        return None
+    except OSError as e:
+        # e.g. permission denied; report it rather than abort the other checkpoints' reports
+        print(f"ERROR: Cannot access {checkpoint_path}: {e}", file=out)
+        return None
+    file_size = stat_result.st_size
+    print(f"File size: {format_size(file_size)} ({file_size:,} bytes)", file=out)
     
     try:
-        # Load checkpoint
-        print("Loading checkpoint...")
-        checkpoint = torch.load(checkpoint_path, map_location='cpu')
-        print(f"Checkpoint loaded successfully!")
+        summary = load_cached_summary(checkpoint_path, stat_result)
+        if summary is not None:
+            print(f"Using cached analysis: {_cache_path(checkpoint_path)}", file=out)
+        else:
+            # Load checkpoint
+            print("Loading checkpoint...", file=out)
+            checkpoint = None
+            if zipfile.is_zipfile(checkpoint_path):
+                try:
+                    checkpoint = load_checkpoint_zip(checkpoint_path)
+                except Exception as e:
+                    # data.pkl uses something the stubs cannot rebuild (e.g. a dict subclass
+                    # stubbed as ObjectStub); torch.load still can
+                    print(f"Metadata-only read failed ({type(e).__name__}: {e}); falling back to torch.load", file=out)
+            if checkpoint is None:
+                checkpoint = load_checkpoint(checkpoint_path)
+            print(f"Checkpoint loaded successfully!", file=out)
+            summary = summarize_checkpoint(checkpoint)
+            save_cached_summary(checkpoint_path, stat_result, summary)
         
         # Basic information
-        print(f"\nTop-level keys: {list(checkpoint.keys())}")
-        print(f"Checkpoint type: {type(checkpoint)}")
+        print(f"\nTop-level keys: {summary['top_level_keys']}", file=out)
+        print(f"Checkpoint type: {summary['checkpoint_type']}", file=out)
         
-        # Analyze each top-level key
+        # Report each top-level key
         total_accounted_size = 0
         key_sizes = {}
         
-        for key in checkpoint.keys():
-            print(f"\n{'-'*60}")
-            print(f"KEY: {key}")
-            print(f"{'-'*60}")
-            
-            value = checkpoint[key]
-            
-            if isinstance(value, dict):
-                # Recursively analyze nested dictionary
-                nested_results = analyze_nested_dict(value, key)
-                
-                # Calculate total size for this key
-                key_size = sum(item.get('size_bytes', 0) for item in nested_results)
-                key_sizes[key] = key_size
-                total_accounted_size += key_size
-                
-                print(f"Type: dict with {len(value)} items")
-                print(f"Total size: {format_size(key_size)}")
-                
-                # Group by type and show largest items
-                tensor_items = [item for item in nested_results if item.get('type') == 'tensor']
-                other_items = [item for item in nested_results if item.get('type') != 'tensor']
-                
-                if tensor_items:
-                    print(f"\nTensors ({len(tensor_items)} items):")
-                    # Sort by size and show top 10
-                    tensor_items.sort(key=lambda x: x.get('size_bytes', 0), reverse=True)
-                    for i, item in enumerate(tensor_items[:10]):
-                        print(f"  {i+1:2d}. {item['key']}: {item['shape']} ({item['dtype']}) - {format_size(item['size_bytes'])}")
-                    
-                    if len(tensor_items) > 10:
-                        print(f"  ... and {len(tensor_items) - 10} more tensors")
-                
-                if other_items:
-                    print(f"\nOther items ({len(other_items)} items):")
-                    for item in other_items[:5]:  # Show first 5
-                        print(f"  - {item['key']}: {item['type']} - {format_size(item.get('size_bytes', 0))}")
-                        if 'value_preview' in item:
-                            print(f"    Preview: {item['value_preview']}")
-                    
-                    if len(other_items) > 5:
-                        print(f"  ... and {len(other_items) - 5} more items")
-            
-            elif torch.is_tensor(value):
-                tensor_info = get_tensor_info(value)
-                key_sizes[key] = tensor_info['size_bytes']
-                total_accounted_size += tensor_info['size_bytes']
-                
-                print(f"Type: tensor")
-                print(f"Shape: {tensor_info['shape']}")
-                print(f"Dtype: {tensor_info['dtype']}")
-                print(f"Size: {format_size(tensor_info['size_bytes'])}")
-                print(f"Device: {tensor_info['device']}")
-            
-            else:
-                item_size = sys.getsizeof(value)
-                key_sizes[key] = item_size
-                total_accounted_size += item_size
-                
-                print(f"Type: {type(value).__name__}")
-                print(f"Size: {format_size(item_size)}")
-                print(f"Preview: {str(value)[:200]}...")
+        for entry in summary['entries']:
+            # build each key's block in memory and hand it to `out` in one write
+            buf = io.StringIO()
+            print_entry(entry, buf)
+            out.write(buf.getvalue())
+            key_sizes[entry['key']] = entry['accounted_bytes']
+            total_accounted_size += entry['accounted_bytes']
         
         # Summary
-        print(f"\n{'='*60}")
-        print(f"SUMMARY")
-        print(f"{'='*60}")
-        print(f"File size: {format_size(file_size)}")
-        print(f"Accounted size: {format_size(total_accounted_size)}")
-        print(f"Unaccounted: {format_size(file_size - total_accounted_size)}")
-        
-        print(f"\nSize breakdown by key:")
+        print(f"\n{'='*60}", file=out)
+        print(f"SUMMARY", file=out)
+        print(f"{'='*60}", file=out)
+        print(f"File size: {format_size(file_size)}", file=out)
+        print(f"Accounted size: {format_size(total_accounted_size)}", file=out)
+        print(f"Unaccounted: {format_size(file_size - total_accounted_size)}", file=out)
+        
+        print(f"\nSize breakdown by key:", file=out)
         sorted_keys = sorted(key_sizes.items(), key=lambda x: x[1], reverse=True)
         for key, size in sorted_keys:
             percentage = (size / file_size) * 100
-            print(f"  {key}: {format_size(size)} ({percentage:.1f}%)")
+            print(f"  {key}: {format_size(size)} ({percentage:.1f}%)", file=out)
         
         return {
             'file_size': file_size,
             'total_accounted_size': total_accounted_size,
             'key_sizes': key_sizes,
-            'top_level_keys': list(checkpoint.keys())
+            'top_level_keys': summary['top_level_keys']
         }
         
     except Exception as e:
-        print(f"ERROR loading checkpoint: {e}")
+        print(f"ERROR loading checkpoint: {e}", file=out)
         import traceback
-        traceback.print_exc()
+        traceback.print_exc(file=out)
         return None
 
 def main():
@@ -196,26 +610,34 @@ def main():
     
     results = {}
     
-    for checkpoint_path in checkpoint_paths:
-        result = analyze_checkpoint(checkpoint_path)
-        if result:
-            results[checkpoint_path] = result
+    # Checkpoints are analyzed concurrently (the work is I/O bound); each report is
+    # buffered and printed in order so the outputs do not interleave
+    def analyze_buffered(checkpoint_path):
+        buf = io.StringIO()
+        return analyze_checkpoint(checkpoint_path, out=buf), buf
     
-    # Comparative analysis
-    print(f"\n{'='*80}")
-    print(f"COMPARATIVE ANALYSIS")
-    print(f"{'='*80}")
+    with ThreadPoolExecutor(max_workers=len(checkpoint_paths)) as executor:
+        for checkpoint_path, (result, buf) in zip(checkpoint_paths, executor.map(analyze_buffered, checkpoint_paths)):
+            sys.stdout.write(buf.getvalue())
+            if result:
+                results[checkpoint_path] = result
+    
+    # Comparative analysis, built in memory and written out at once
+    out = io.StringIO()
+    print(f"\n{'='*80}", file=out)
+    print(f"COMPARATIVE ANALYSIS", file=out)
+    print(f"{'='*80}", file=out)
     
     for path, result in results.items():
         filename = os.path.basename(path)
-        print(f"\n{filename}:")
-        print(f"  File size: {format_size(result['file_size'])}")
-        print(f"  Top-level keys: {result['top_level_keys']}")
+        print(f"\n{filename}:", file=out)
+        print(f"  File size: {format_size(result['file_size'])}", file=out)
+        print(f"  Top-level keys: {result['top_level_keys']}", file=out)
         
         # Show largest components
         if result['key_sizes']:
             largest_key = max(result['key_sizes'].items(), key=lambda x: x[1])
-            print(f"  Largest component: {largest_key[0]} ({format_size(largest_key[1])})")
+            print(f"  Largest component: {largest_key[0]} ({format_size(largest_key[1])})", file=out)
     
     # Look for unique keys
     if len(results) > 1:
@@ -223,7 +645,7 @@ def main():
         for result in results.values():
             all_keys.update(result['top_level_keys'])
         
-        print(f"\nAll unique top-level keys found: {sorted(all_keys)}")
+        print(f"\nAll unique top-level keys found: {sorted(all_keys)}", file=out)
         
         # Check which keys are in which files
         for key in sorted(all_keys):
@@ -231,7 +653,10 @@ def main():
             for path, result in results.items():
                 if key in result['top_level_keys']:
                     files_with_key.append(os.path.basename(path))
-            print(f"  {key}: {files_with_key}")
+            print(f"  {key}: {files_with_key}", file=out)
+    
+    sys.stdout.write(out.getvalue())
+    sys.stdout.flush()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
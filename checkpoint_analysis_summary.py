@@ -4,16 +4,7 @@ Checkpoint Analysis Summary
 Key findings from the checkpoint analysis.
 """
 
-def format_size(size_bytes):
-    """Convert bytes to human readable format"""
-    if size_bytes == 0:
-        return "0B"
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
-    return f"{size_bytes:.2f}{size_names[i]}"
+from checkpoint_utils import format_size
 
 def main():
     print("CHECKPOINT SIZE ANALYSIS SUMMARY")
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Checkpoint Utilities
+Helpers shared by the checkpoint analysis scripts.
+"""
+
+import math
+
+_UNITS = ("B", "KB", "MB", "GB", "TB")
+
+def format_size(size_bytes):
+    """Convert bytes to human readable format"""
+    if size_bytes < 0:
+        return "-" + format_size(-size_bytes)
+    if size_bytes == 0:
+        return "0B"
+    # unit index straight from the magnitude: every 10 bits is one 1024x step
+    if isinstance(size_bytes, int):
+        i = (size_bytes.bit_length() - 1) // 10
+    else:
+        i = max(int(math.log2(size_bytes)), 0) // 10
+    i = min(i, len(_UNITS) - 1)
+    return f"{size_bytes / (1 << (10 * i)):.2f}{_UNITS[i]}"